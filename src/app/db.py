@@ -0,0 +1,59 @@
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import asyncio
+from fastapi import APIRouter, FastAPI, Request
+import asyncpg
+import boto3
+import os
+
+router = APIRouter()
+
+# Load DATABASE_URL from AWS SSM Parameter Store, once per process and only when first needed
+@lru_cache(maxsize=1)
+def get_db_url() -> str:
+    ssm = boto3.client("ssm", region_name=os.environ.get("AWS_REGION", "us-west-1"))
+    param = ssm.get_parameter(Name="/football/DATABASE_URL", WithDecryption=True)
+    return param["Parameter"]["Value"]
+
+async def get_pool(app: FastAPI):
+    # Created lazily as well, so the API still starts (and reports the error) if the DB is down
+    if app.state.pool is None:
+        # Concurrent first requests would otherwise each create (and leak) a pool
+        async with app.state.pool_lock:
+            if app.state.pool is None:
+                # boto3 blocks (with retries) and lru_cache doesn't cache failures, so keep the
+                # SSM lookup off the event loop or a down SSM would stall every route
+                db_url = await asyncio.to_thread(get_db_url)
+                app.state.pool = await asyncpg.create_pool(db_url, min_size=2, max_size=10)
+    return app.state.pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.pool = None
+    app.state.pool_lock = asyncio.Lock()
+    try:
+        await get_pool(app)
+    except Exception as e:
+        print(f"Could not create DB pool at startup: {e}")
+    yield
+    if app.state.pool is not None:
+        await app.state.pool.close()
+
+@router.get("/api")
+def read_root():
+    return {"message": "Football analytics API is live!"}
+
+@router.get("/api/db-check")
+async def db_check(request: Request):
+    try:
+        pool = await get_pool(request.app)
+        async with pool.acquire() as conn:
+            # Scalar, not a row mapping: no per-row record/dict building on the health path
+            result = await conn.fetchval("SELECT 1;")
+        return {"db_status": "Connected", "result": result}
+    except Exception as e:
+        return {"db_status": "Error", "detail": str(e)}
+
+@router.get("/api/health")
+def health_check():
+    return {"status": "ok"}
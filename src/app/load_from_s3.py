@@ -1,16 +1,40 @@
 import os
-import json
+import io
+import argparse
+import asyncio
+import asyncpg
+import ijson
+import orjson
 import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
 import boto3
-from psycopg2.extras import execute_values
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+import contextlib
 import concurrent.futures
+import functools
+import hashlib
+import logging
+import queue
 import threading
+import time
 
 # Global lock for safe printing and global progress
 print_lock = threading.Lock()
 progress_lock = threading.Lock()
 global_counter = 0
 
+# Per-match progress goes through logging so it can be filtered; silent unless configured
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+PROGRESS_STEPS = 100  # progress lines per per-match load, however many matches
+
+def progress_due(done, total):
+    """True on roughly every 1% of `total` and on the last item, so workers only log
+    (and contend on the handler's lock) about PROGRESS_STEPS times per run."""
+    return done == total or done % max(1, total // PROGRESS_STEPS) == 0
+
 
 from dotenv import load_dotenv
 
@@ -19,17 +43,58 @@ load_dotenv()
 
 
 # === Load secure parameters from AWS SSM Parameter Store ===
-ssm = boto3.client("ssm", region_name=os.getenv("AWS_REGION", "us-west-1"))
-
-def get_ssm_param(name):
-    response = ssm.get_parameter(Name=name, WithDecryption=True)
-    return response["Parameter"]["Value"]   
-
-# Load secrets from SSM (fallback to env if not found)
-DATABASE_URL = os.getenv("DATABASE_URL") or get_ssm_param("/football/DATABASE_URL")
-S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME") or get_ssm_param("/football/S3_BUCKET_NAME")
+SSM_PARAMS = {
+    "DATABASE_URL": "/football/DATABASE_URL",
+    "S3_BUCKET_NAME": "/football/S3_BUCKET_NAME",
+}
+
+def get_ssm_params(names):
+    """Fetch several SSM parameters in a single get_parameters round-trip. Raises if any
+    of them can't be read: callers only ask for values the environment doesn't provide,
+    so there is nothing to fall back to."""
+    if not names:
+        return {}
+    try:
+        ssm = boto3.client("ssm", region_name=os.getenv("AWS_REGION", "us-west-1"))
+        response = ssm.get_parameters(Names=names, WithDecryption=True)
+    except Exception as e:
+        raise RuntimeError(f"Could not read SSM parameters {names}: {e}") from e
+    if response["InvalidParameters"]:
+        raise RuntimeError(f"SSM parameters not found: {response['InvalidParameters']}")
+    return {p["Name"]: p["Value"] for p in response["Parameters"]}
+
+# Load secrets from env first; only ask SSM for the ones that are missing
+_ssm_values = get_ssm_params([path for env, path in SSM_PARAMS.items() if not os.getenv(env)])
+DATABASE_URL = os.getenv("DATABASE_URL") or _ssm_values.get(SSM_PARAMS["DATABASE_URL"])
+S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME") or _ssm_values.get(SSM_PARAMS["S3_BUCKET_NAME"])
 S3_PREFIX = os.getenv("S3_PREFIX", "open-data/data/")
 AWS_REGION = os.getenv("AWS_REGION", "us-west-1")
+COPY_PAGE_SIZE = int(os.getenv("COPY_PAGE_SIZE", "10000"))  # rows buffered per COPY round-trip
+S3_MAX_WORKERS = int(os.getenv("S3_MAX_WORKERS", "32"))  # parallel S3 GETs
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", str(2 * S3_MAX_WORKERS)))  # fetched-but-unwritten objects
+S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", "/tmp/sb-cache")  # on-disk copies of the index files
+S3_CACHE_TTL = int(os.getenv("S3_CACHE_TTL", str(24 * 3600)))  # seconds; 0 disables the disk cache
+
+# Event files can be several MB; above the threshold they download as parallel ranged GETs
+MB = 1 << 20
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=5 * MB,
+    multipart_chunksize=5 * MB,
+    max_concurrency=4,
+    use_threads=True
+)
+
+# Built once and shared by every thread. Size the connection pool for the worst case
+# (every fetcher in a ranged download) so GETs never queue for a socket, and keep
+# connections warm so they skip TLS setup.
+S3_CONFIG = Config(
+    region_name=AWS_REGION,
+    max_pool_connections=max(64, S3_MAX_WORKERS * S3_TRANSFER_CONFIG.max_request_concurrency),
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 10},
+    connect_timeout=3,
+    read_timeout=30
+)
 
 # === Use instance role OR .env credentials ===
 if os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
@@ -37,309 +102,791 @@ if os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
         "s3",
         region_name=AWS_REGION,
         aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        config=S3_CONFIG
     )
 else:
-    s3 = boto3.client("s3", region_name=AWS_REGION)
+    s3 = boto3.client("s3", region_name=AWS_REGION, config=S3_CONFIG)
+
+
+# === S3 fetch helpers ===
+def fetch_json(key):
+    # orjson parses the raw bytes directly; no text decode or file-like state machine
+    return orjson.loads(s3.get_object(Bucket=S3_BUCKET_NAME, Key=key)["Body"].read())
+
+def download_large(key):
+    """Download through the managed transfer so big objects are split into ranged GETs.
+    It costs an extra HEAD request, so only use it for the large event files."""
+    buf = io.BytesIO()
+    s3.download_fileobj(S3_BUCKET_NAME, key, buf, Config=S3_TRANSFER_CONFIG)
+    buf.seek(0)
+    return buf
+
+def fetch_cached_json(key):
+    """fetch_json backed by S3_CACHE_DIR, so separate runs (one loader per process)
+    don't re-download the same index files. Entries expire S3_CACHE_TTL seconds
+    after they were written."""
+    if S3_CACHE_TTL <= 0:
+        return fetch_json(key)
+    digest = hashlib.sha256(f"{S3_BUCKET_NAME}/{key}".encode()).hexdigest()
+    path = os.path.join(S3_CACHE_DIR, f"{digest}.json")
+    try:
+        if time.time() - os.path.getmtime(path) < S3_CACHE_TTL:
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        pass  # missing, unreadable or corrupt: fall through to S3
+
+    body = s3.get_object(Bucket=S3_BUCKET_NAME, Key=key)["Body"].read()
+    data = orjson.loads(body)
+    try:
+        os.makedirs(S3_CACHE_DIR, exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ Could not cache {key}: {e}")
+    return data
+
+@functools.lru_cache(maxsize=None)
+def get_json(key):
+    """Cached fetch for the small index files (competitions.json, matches/*.json)
+    that every loader walks; they don't change within a run."""
+    return fetch_cached_json(key)
+
+def _fetch_safe(fetch, key):
+    try:
+        return key, fetch(key), None
+    except Exception as e:
+        return key, None, e
+
+def fetch_many(keys, fetch=fetch_json):
+    """Fetch S3 objects in parallel, yielding (key, data, error) in completion order,
+    so one slow object doesn't hold back the ones already downloaded. Match results
+    by `key`, which is whatever `fetch` takes: an S3 key by default.
+    Only the GETs run on worker threads; callers consume results (and write to the DB)
+    on the calling thread while the next objects download.
+
+    At most PREFETCH_DEPTH fetches are queued or waiting to be consumed, so a slow
+    writer holds back the fetchers instead of piling up parsed JSON in memory."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=S3_MAX_WORKERS) as executor:
+        pending = set()
+        try:
+            for key in keys:
+                pending.add(executor.submit(_fetch_safe, fetch, key))
+                if len(pending) >= PREFETCH_DEPTH:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        yield future.result()
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
+        finally:
+            # Closed early: drop fetches that haven't started, only wait for running ones
+            for future in pending:
+                future.cancel()
+
+_DONE = object()  # end-of-stream sentinel for prefetch_in_background
+
+@contextlib.contextmanager
+def prefetch_in_background(items, depth=PREFETCH_DEPTH):
+    """Drain the `items` iterator on a background thread into a bounded queue, so
+    producing the next items (e.g. fetch_many's downloads) overlaps with whatever the
+    caller does before and while consuming them. Yields the consuming iterator;
+    producer errors re-raise on the consumer. Leaving the block, normally or on an
+    error, stops the producer and waits for it, so no thread keeps downloading."""
+    q = queue.Queue(maxsize=depth)
+    errors = []
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                q.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # Closes fetch_many too, which shuts its executor down
+            if hasattr(items, "close"):
+                items.close()
+            q.put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    def consume():
+        while (item := q.get()) is not _DONE:
+            yield item
+        if errors:
+            raise errors[0]
 
+    try:
+        yield consume()
+    finally:
+        stop.set()
+        # Keep emptying the queue so a producer blocked on put() can see `stop` and exit
+        while producer.is_alive():
+            try:
+                q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+# === Database connections ===
+_conn = None
+_pool = None
+_pool_lock = threading.Lock()
+
+DB_MAX_WORKERS = 8  # concurrent per-match writers; tune based on EC2 and RDS limits
+
+class BulkConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which statements it has PREPAREd and
+    which TEMP staging tables it has created."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.stages = set()
+
+# Connections for bulk loads use asynchronous commit. Safe for replayable loads:
+# a crash can only lose the last few commits, never corrupt.
+BULK_CONNECT_KWARGS = {
+    "connection_factory": BulkConnection,
+    "options": "-c synchronous_commit=off",
+}
+
+def connect():
+    """Open a connection tuned for bulk loads (explicit transactions, asynchronous commit)."""
+    return psycopg2.connect(DATABASE_URL, **BULK_CONNECT_KWARGS)
+
+def get_connection():
+    """Long-lived connection shared by the single-threaded loaders."""
+    global _conn
+    if _conn is None or _conn.closed:
+        _conn = connect()
+    return _conn
+
+def get_pool():
+    """Thread-safe pool for the per-match writers, so each match reuses a warm
+    connection (and its prepared statements) instead of a new handshake."""
+    global _pool
+    if _pool is None:
+        # The writer threads all ask for it at once; without the lock each would open its own pool
+        with _pool_lock:
+            if _pool is None:
+                # minconn == maxconn: putconn closes returned connections beyond minconn, which
+                # would throw away their PREPAREd merges and TEMP stages mid-run
+                _pool = ThreadedConnectionPool(
+                    DB_MAX_WORKERS, DB_MAX_WORKERS, DATABASE_URL, **BULK_CONNECT_KWARGS
+                )
+    return _pool
 
-def load_competitions():
-    print("Loading competitions.json...")
-    obj = s3.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_PREFIX}competitions.json")
-    data = json.load(obj["Body"])
+@contextlib.contextmanager
+def pooled_connection():
+    """Borrow a pooled connection for one transaction (commit on success, rollback on error)."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn:
+            yield conn
+    except Exception:
+        # The rollback may have dropped a TEMP stage created in this transaction
+        conn.stages.clear()
+        raise
+    finally:
+        pool.putconn(conn)
+
+def close_connection():
+    global _conn, _pool
+    if _conn is not None and not _conn.closed:
+        _conn.close()
+    _conn = None
+    if _pool is not None:
+        _pool.closeall()
+    _pool = None
+
+
+# === Bulk COPY helpers ===
+def _copy_value(value):
+    """Render a single value in PostgreSQL's COPY text format."""
+    if value is None:
+        return r"\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
 
-    with psycopg2.connect(DATABASE_URL) as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS competitions (
-                    competition_id INT,
-                    season_id INT,
-                    country_name TEXT,
-                    competition_name TEXT,
-                    season_name TEXT
-                )
-            """)
+def _flush_copy(cur, sql, buf):
+    buf.seek(0)
+    cur.copy_expert(sql, buf)
+
+def copy_rows(cur, table, columns, rows, page_size=None):
+    """Stream rows into `table` with COPY ... FROM STDIN, one COPY per `page_size` rows
+    so the client-side buffer stays bounded. `rows` can be any iterable; pass a
+    generator and rows go straight into the COPY buffer without an intermediate list.
+    Returns the row count."""
+    page_size = page_size or COPY_PAGE_SIZE
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)"
+    buf = io.StringIO()
+    count = 0
+    for row in rows:
+        buf.write("\t".join(map(_copy_value, row)) + "\n")
+        count += 1
+        if count % page_size == 0:
+            _flush_copy(cur, sql, buf)
+            buf = io.StringIO()
+
+    if count % page_size:
+        _flush_copy(cur, sql, buf)
+    return count
+
+def copy_rows_on_conflict(cur, table, columns, rows):
+    """COPY rows into a session-local staging table, then merge them into `table`
+    with a single INSERT ... SELECT ... ON CONFLICT DO NOTHING. Call at most once
+    per table per transaction."""
+    stage = f"{table}_stage"
+    cols = ", ".join(columns)
+
+    # TEMP tables are per-session and skip WAL, so concurrent loaders never share a stage.
+    # ON COMMIT DELETE ROWS empties it at every commit/rollback, so a pooled connection
+    # creates it once and each later match goes straight to COPY.
+    conn = cur.connection
+    if stage not in conn.stages:
+        cur.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DELETE ROWS
+            AS SELECT {cols} FROM {table} WITH NO DATA
+        """)
+        conn.stages.add(stage)
+
+    count = copy_rows(cur, stage, columns, rows)
+    if count:
+        execute_prepared(cur, f"merge_{table}", f"""
+            INSERT INTO {table} ({cols})
+            SELECT {cols} FROM {stage}
+            ON CONFLICT DO NOTHING
+        """)
+    return count
+
+def execute_prepared(cur, name, sql):
+    """Run `sql` as the named prepared statement, issuing PREPARE only the first time
+    on this connection so repeated merges skip parse and plan."""
+    conn = cur.connection
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {sql}")
+        # PREPARE is session-scoped and survives rollbacks, so this stays accurate
+        conn.prepared.add(name)
+    cur.execute(f"EXECUTE {name}")
+
+def create_stage(cur, table):
+    """Empty UNLOGGED staging table for single-writer loads that merge once at the end.
+    Unlike the TEMP stage it survives commits, so per-file commits keep their rows."""
+    stage = f"{table}_stage"
+    cur.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS)")
+    cur.execute(f"TRUNCATE {stage}")
+    return stage
+
+def merge_stage(cur, table, columns, key):
+    """Dedup the staging table on `key` and merge it into `table` in one statement.
+    The primary key is dropped for the insert and rebuilt afterwards: one sorted index
+    build beats per-row B-tree maintenance. Commit afterwards as one transaction so a
+    failure also rolls the constraint change back. Returns the number of new rows."""
+    stage = f"{table}_stage"
+    cols = ", ".join(columns)
+    cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_pkey")
+    # Without the PK there is no ON CONFLICT target, so skip existing keys with an anti-join
+    cur.execute(f"""
+        INSERT INTO {table} ({cols})
+        SELECT DISTINCT ON ({key}) {cols} FROM {stage} s
+        WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{key} = s.{key})
+    """)
+    merged = cur.rowcount
+    cur.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({key})")
+    cur.execute(f"TRUNCATE {stage}")
+    return merged
+
+
+# === Table definitions ===
+LOADERS = ["competitions", "matches", "lineups", "events"]
+
+TABLES = {
+    "competitions": """
+        CREATE TABLE IF NOT EXISTS competitions (
+            competition_id INT,
+            season_id INT,
+            country_name TEXT,
+            competition_name TEXT,
+            season_name TEXT
+        )
+    """,
+    "matches": """
+        CREATE TABLE IF NOT EXISTS matches (
+            match_id BIGINT PRIMARY KEY,
+            competition_id INT,
+            season_id INT,
+            match_date DATE,
+            home_team TEXT,
+            away_team TEXT
+        )
+    """,
+    "lineups": """
+        CREATE TABLE IF NOT EXISTS lineups (
+            match_id BIGINT,
+            team_name TEXT,
+            player_name TEXT
+        )
+    """,
+    # Hash-partitioned on match_id so concurrent per-match writers land on different
+    # heaps and indexes instead of contending on one. A partitioned table can only
+    # enforce keys that include match_id, so `id` is no longer the primary key.
+    "events": """
+        CREATE TABLE IF NOT EXISTS events (
+            id SERIAL,
+            match_id BIGINT NOT NULL,
+            index INT,
+            timestamp TEXT,
+            type TEXT,
+            UNIQUE (match_id, index)
+        ) PARTITION BY HASH (match_id)
+    """,
+}
+
+# Hash on match_id rather than LIST on competition_id: matches are queued competition
+# by competition, so LIST partitions would put every worker on the same partition,
+# and the Streamlit queries prune on match_id. This is the table's hash modulus, not
+# a tuning knob: it is fixed once the partitions exist.
+EVENT_PARTITIONS = 8
+
+# Full event loads drop the secondary index and build it once at the end, instead of
+# maintaining it per row. The UNIQUE (match_id, index) index stays for ON CONFLICT.
+# CONCURRENTLY isn't supported on partitioned tables; the build only blocks writes.
+EVENTS_DROP_INDEX = "DROP INDEX IF EXISTS idx_match_index"
+EVENTS_BUILD_INDEX = "CREATE INDEX IF NOT EXISTS idx_match_index ON events(match_id, index)"
+
+# After a full load, rewrite the heap in (match_id, index) order so the Streamlit
+# per-match query reads a contiguous range. Must run outside a transaction block;
+# CLUSTER on a partitioned table needs Postgres 15+.
+EVENTS_CLUSTER = [
+    "CLUSTER events USING idx_match_index",
+    "ANALYZE events",
+]
+
+# Run after TABLES["events"]. Partitions are only created when `events` is actually
+# partitioned and has none yet, so a database with the older, unpartitioned table, or
+# with partitions under a different modulus, keeps loading.
+EVENTS_SETUP = [
+    f"""
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'events'::regclass)
+           AND NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhparent = 'events'::regclass) THEN
+            FOR i IN 0..{EVENT_PARTITIONS - 1} LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS events_p%s PARTITION OF events FOR VALUES WITH (MODULUS {EVENT_PARTITIONS}, REMAINDER %s)',
+                    i, i
+                );
+            END LOOP;
+        END IF;
+    END $$
+    """,
+    EVENTS_BUILD_INDEX,
+]
+
+
+EVENT_COLUMNS = ["match_id", "index", "timestamp", "type"]
+
+# Shared default for events without a "type", so the hot loop doesn't build an empty
+# dict per event. Only ever read, never mutated.
+_NO_TYPE = {}
+
+def event_rows(match_id, data):
+    return (
+        (
+            match_id,
+            event.get("index"),
+            event.get("timestamp"),
+            event.get("type", _NO_TYPE).get("name")
+        )
+        for event in data
+    )
 
-            for row in data:
-                cur.execute("""
-                    INSERT INTO competitions (competition_id, season_id, country_name, competition_name, season_name)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (
+def fetch_event_rows(match_id):
+    """Download one events file and project it to EVENT_COLUMNS rows. ijson walks the
+    array one event at a time, so the full dict tree of a large match never exists
+    at once; only the raw bytes and the small row tuples are held."""
+    buf = download_large(f"{S3_PREFIX}events/{match_id}.json")
+    return list(event_rows(match_id, ijson.items(buf, "item")))
+
+LINEUP_COLUMNS = ["match_id", "team_name", "player_name"]
+
+def fetch_lineup_rows(match_id):
+    data = fetch_json(f"{S3_PREFIX}lineups/{match_id}.json")
+    return [
+        (match_id, team["team_name"], player["player_name"])
+        for team in data
+        for player in team["lineup"]
+    ]
+
+def get_match_files(competitions):
+    """Read every matches/{comp}/{season}.json in parallel; returns (comp_id, season_id, matches)."""
+    keys = [
+        f"{S3_PREFIX}matches/{comp['competition_id']}/{comp['season_id']}.json"
+        for comp in competitions
+    ]
+    # fetch_many yields as files land; keep the competitions order for the output
+    results = {key: (matches, error) for key, matches, error in fetch_many(keys, fetch=get_json)}
+    match_files = []
+    for comp, key in zip(competitions, keys):
+        matches, error = results[key]
+        comp_id = comp["competition_id"]
+        season_id = comp["season_id"]
+        if error:
+            print(f"⚠️ Failed to read matches for comp {comp_id}, season {season_id}: {error}")
+            continue
+        match_files.append((comp_id, season_id, matches))
+    return match_files
+
+
+def copy_competitions(conn, competitions):
+    with conn.cursor() as cur:
+        count = copy_rows(cur,
+            "competitions",
+            ["competition_id", "season_id", "country_name", "competition_name", "season_name"],
+            (
+                (
                     row["competition_id"],
                     row["season_id"],
                     row["country_name"],
                     row["competition_name"],
                     row["season_name"]
-                ))
-
-    print("Done: competitions.json loaded.")
-
-def load_matches():
-    print("Loading matches...")
-    with psycopg2.connect(DATABASE_URL) as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS matches (
-                    match_id BIGINT PRIMARY KEY,
-                    competition_id INT,
-                    season_id INT,
-                    match_date DATE,
-                    home_team TEXT,
-                    away_team TEXT
                 )
-            """)
-
-            competitions = json.load(s3.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_PREFIX}competitions.json")["Body"])
-
-            for comp in competitions:
-                comp_id = comp["competition_id"]
-                season_id = comp["season_id"]
-                key = f"{S3_PREFIX}matches/{comp_id}/{season_id}.json"
-
-                print(f"Loading matches for competition {comp_id} season {season_id}...")
-                try:
-                    data = json.load(s3.get_object(Bucket=S3_BUCKET_NAME, Key=key)["Body"])
-                    for match in data:
-                        cur.execute("""
-                            INSERT INTO matches (match_id, competition_id, season_id, match_date, home_team, away_team)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (match_id) DO NOTHING
-                        """, (
+                for row in competitions
+            )
+        )
+    conn.commit()
+    print(f"Done: {count} competitions loaded.")
+
+def copy_matches(conn, match_files):
+    columns = ["match_id", "competition_id", "season_id", "match_date", "home_team", "away_team"]
+
+    with conn.cursor() as cur:
+        stage = create_stage(cur, "matches")
+        conn.commit()
+
+        for comp_id, season_id, data in match_files:
+            try:
+                count = copy_rows(cur,
+                    stage,
+                    columns,
+                    (
+                        (
                             match["match_id"],
                             comp_id,
                             season_id,
                             match["match_date"],
                             match["home_team"]["home_team_name"],
                             match["away_team"]["away_team_name"]
-                        ))
-                        print(f"Inserted match {match['match_id']} for competition {comp_id} season {season_id}")
-                except Exception as e:
-                    print(f"Failed to load matches from {key}: {e}")
-
-    print("Done: matches loaded.")
-
-
-def load_lineups():
-    print("Loading lineups...")
-
-    with psycopg2.connect(DATABASE_URL) as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS lineups (
-                    match_id BIGINT,
-                    team_name TEXT,
-                    player_name TEXT
-                )
-            """)
-
-            competitions = json.load(
-                s3.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_PREFIX}competitions.json")["Body"]
-            )
-
-            for comp in competitions:
-                comp_id = comp["competition_id"]
-                season_id = comp["season_id"]
-                match_key = f"{S3_PREFIX}matches/{comp_id}/{season_id}.json"
-
-                print(f"\n📂 Competition {comp_id}, Season {season_id}:")
-
-                try:
-                    matches = json.load(
-                        s3.get_object(Bucket=S3_BUCKET_NAME, Key=match_key)["Body"]
+                        )
+                        for match in data
                     )
-                    total_matches = len(matches)
-
-                    for idx, match in enumerate(matches):
-                        match_id = match["match_id"]
-                        key = f"{S3_PREFIX}lineups/{match_id}.json"
-
-                        try:
-                            data = json.load(
-                                s3.get_object(Bucket=S3_BUCKET_NAME, Key=key)["Body"]
-                            )
-
-                            rows_to_insert = []
-                            for team in data:
-                                team_name = team["team_name"]
-                                for player in team["lineup"]:
-                                    rows_to_insert.append((match_id, team_name, player["player_name"]))
-
-                            if rows_to_insert:
-                                execute_values(cur,
-                                    """
-                                    INSERT INTO lineups (match_id, team_name, player_name)
-                                    VALUES %s
-                                    """,
-                                    rows_to_insert
-                                )
-
-                            percent = int((idx + 1) / total_matches * 100)
-                            print(f"✅ Match {match_id} loaded ({percent}%)")
-
-                        except Exception as e:
-                            print(f"⚠️ Failed to load lineups for match {match_id}: {e}")
-
-                except Exception as e:
-                    print(f"⚠️ Failed to load match list for competition {comp_id}, season {season_id}: {e}")
-
-    print("\n🎉 Done: all lineups loaded.")
+                )
+                conn.commit()
+                print(f"Staged {count} matches for competition {comp_id} season {season_id}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Failed to load matches for competition {comp_id} season {season_id}: {e}")
+
+        # One dedup + conflict pass for the whole run instead of one per file
+        merged = merge_stage(cur, "matches", columns, "match_id")
+        conn.commit()
+    print(f"Done: {merged} new matches loaded.")
+
+MATCH_FETCHERS = {"lineups": fetch_lineup_rows, "events": fetch_event_rows}
+
+def fetch_match(match_info, subset):
+    """Download and project every per-match file in `subset` for one match. Runs on an
+    S3 fetcher thread. Returns (rows, errors), both keyed by loader name: each file is
+    fetched on its own, so a missing lineups file doesn't cost the match its events."""
+    match_id = match_info[2]["match_id"]
+    rows, errors = {}, {}
+    for name in subset:
+        try:
+            rows[name] = MATCH_FETCHERS[name](match_id)
+        except Exception as e:
+            errors[name] = e
+    return rows, errors
 
-def load_single_match(match_info, total_matches):
+def load_single_match(fetched, total_matches, subset=("events",)):
+    """Write one match's prefetched lineups and/or events from the pool. `fetched` is
+    a (match_info, (rows, errors), error) item from fetch_many. Each table is written in
+    its own transaction, so a failure only drops that table's rows for the match."""
     global global_counter
 
-    comp_id, season_id, match = match_info
+    (comp_id, season_id, match), result, error = fetched
     match_id = match["match_id"]
-    key = f"{S3_PREFIX}events/{match_id}.json"
-
-    try:
-        # Create new DB connection per thread
-        with psycopg2.connect(DATABASE_URL) as conn:
-            with conn.cursor() as cur:
-                # Load event data from S3
-                data = json.load(
-                    s3.get_object(Bucket=S3_BUCKET_NAME, Key=key)["Body"]
-                )
+    rows, errors = result if error is None else ({}, dict.fromkeys(subset, error))
 
-                rows_to_insert = [
-                    (
-                        match_id,
-                        event.get("index"),
-                        event.get("timestamp"),
-                        event.get("type", {}).get("name")
-                    )
-                    for event in data
-                ]
-
-                if rows_to_insert:
-                    execute_values(cur,
-                        """
-                        INSERT INTO events (match_id, index, timestamp, type)
-                        VALUES %s
-                        ON CONFLICT DO NOTHING
-                        """,
-                        rows_to_insert
-                    )
-
-        with progress_lock:
-            global_counter += 1
-            progress = (global_counter / total_matches) * 100
-            with print_lock:
-                print(f"✅ Match {match_id} inserted ({global_counter}/{total_matches} - {progress:.1f}%)")
+    for name, table_rows in rows.items():
+        try:
+            with pooled_connection() as conn, conn.cursor() as cur:
+                if name == "events":
+                    copy_rows_on_conflict(cur, "events", EVENT_COLUMNS, table_rows)
+                else:
+                    copy_rows(cur, "lineups", LINEUP_COLUMNS, table_rows)
+        except Exception as e:
+            errors[name] = e
 
-    except Exception as e:
+    if errors:
         with print_lock:
-            print(f"⚠️ Failed to load events for match {match_id}: {e}")
-
-def load_events():
+            for name, e in errors.items():
+                print(f"⚠️ Failed to load {name} for match {match_id}: {e}")
+        return
+
+    with progress_lock:
+        global_counter += 1
+        done = global_counter
+    if progress_due(done, total_matches):
+        logger.info(f"✅ {done}/{total_matches} matches inserted ({done / total_matches * 100:.1f}%)")
+
+def load_all(subset=LOADERS, match_ids=None):
+    """Run the selected loaders in one traversal: competitions.json and every
+    matches/*.json are read once, and each match's lineups and events are fetched
+    together and written by the same worker task. `match_ids` limits the per-match loaders
+    to those matches."""
     global global_counter
-    print("Loading events (concurrent mode)...")
-
-    with psycopg2.connect(DATABASE_URL) as conn:
+    subset = [name for name in LOADERS if name in subset]
+    print(f"Loading {', '.join(subset)}...")
+
+    conn = get_connection()
+    with conn.cursor() as cur:
+        for name in subset:
+            cur.execute(TABLES[name])
+        if "events" in subset:
+            for stmt in EVENTS_SETUP:
+                cur.execute(stmt)
+    conn.commit()
+
+    competitions = get_json(f"{S3_PREFIX}competitions.json")
+    if "competitions" in subset:
+        copy_competitions(conn, competitions)
+
+    per_match = [name for name in ("lineups", "events") if name in subset]
+    if "matches" not in subset and not per_match:
+        return
+
+    match_files = get_match_files(competitions)
+
+    with contextlib.ExitStack() as stack:
+        if per_match:
+            match_list = [
+                (comp_id, season_id, m)
+                for comp_id, season_id, matches in match_files
+                for m in matches
+                if match_ids is None or m["match_id"] in match_ids
+            ]
+
+            # S3 GETs for many matches stay in flight on the fetcher pool (S3_MAX_WORKERS),
+            # independent of how many DB writers run. Started in the background now, so the
+            # first downloads overlap the matches load and index drop below; the stack stops
+            # the producer if either of them fails.
+            fetched = stack.enter_context(prefetch_in_background(
+                fetch_many(match_list, fetch=functools.partial(fetch_match, subset=per_match)),
+                depth=DB_MAX_WORKERS
+            ))
+
+        if "matches" in subset:
+            copy_matches(conn, match_files)
+
+        if per_match:
+            total_matches = len(match_list)
+            global_counter = 0
+            print(f"\nTotal matches to process: {total_matches}\n")
+
+            rebuild_index = "events" in per_match and match_ids is None
+            if rebuild_index:
+                with conn.cursor() as cur:
+                    cur.execute(EVENTS_DROP_INDEX)
+                conn.commit()
+
+            # Run concurrently
+            max_workers = DB_MAX_WORKERS
+            get_pool()  # open the writers' pool up front, before they race for it
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Bounded window: submit the next match only as one finishes, so a slow match
+                # doesn't block the rest and pending payloads stay O(workers), not O(matches)
+                inflight = set()
+                for item in fetched:
+                    if len(inflight) >= 2 * max_workers:
+                        _, inflight = concurrent.futures.wait(
+                            inflight, return_when=concurrent.futures.FIRST_COMPLETED
+                        )
+                    inflight.add(executor.submit(load_single_match, item, total_matches, per_match))
+                concurrent.futures.wait(inflight)
+
+            if rebuild_index:
+                print("Building idx_match_index...")
+                with conn.cursor() as cur:
+                    cur.execute(EVENTS_BUILD_INDEX)
+                conn.commit()
+                cluster_events(conn)
+
+            print(f"\n🎉 Done: all {' + '.join(per_match)} loaded (concurrently).")
+
+def cluster_events(conn):
+    print("Clustering events...")
+    conn.autocommit = True
+    try:
         with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id SERIAL PRIMARY KEY,
-                    match_id BIGINT,
-                    index INT,
-                    timestamp TEXT,
-                    type TEXT,
-                    UNIQUE (match_id, index)
-                )
-            """)
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_match_index ON events(match_id, index)")
+            for stmt in EVENTS_CLUSTER:
+                try:
+                    cur.execute(stmt)
+                except psycopg2.Error as e:
+                    print(f"⚠️ {stmt} failed: {e}")
+    finally:
+        conn.autocommit = False
 
-    # Preload all matches to prepare job list
-    competitions = json.load(
-        s3.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_PREFIX}competitions.json")["Body"]
-    )
 
-    match_list = []
-    for comp in competitions:
-        comp_id = comp["competition_id"]
-        season_id = comp["season_id"]
-        match_key = f"{S3_PREFIX}matches/{comp_id}/{season_id}.json"
-        try:
-            matches = json.load(
-                s3.get_object(Bucket=S3_BUCKET_NAME, Key=match_key)["Body"]
-            )
-            match_list.extend([(comp_id, season_id, m) for m in matches])
-        except Exception as e:
-            print(f"⚠️ Failed to read matches for comp {comp_id}, season {season_id}: {e}")
+# === asyncio pipeline (events) ===
+async def _load_match_events_async(pool, executor, semaphore, match_id, progress):
+    cols = ", ".join(EVENT_COLUMNS)
+    try:
+        # The semaphore covers fetch and write, so at most S3_MAX_WORKERS payloads are in memory
+        async with semaphore:
+            # boto3 and ijson are blocking, so the GET and parse run on the executor
+            rows = await asyncio.get_running_loop().run_in_executor(executor, fetch_event_rows, match_id)
+
+            async with pool.acquire() as conn, conn.transaction():
+                # Binary COPY into the session's TEMP stage, then one conflict-aware merge
+                await conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS events_stage AS SELECT {cols} FROM events WITH NO DATA")
+                await conn.execute("TRUNCATE events_stage")
+                await conn.copy_records_to_table(
+                    "events_stage",
+                    records=rows,
+                    columns=EVENT_COLUMNS
+                )
+                await conn.execute(f"""
+                    INSERT INTO events ({cols})
+                    SELECT {cols} FROM events_stage
+                    ON CONFLICT DO NOTHING
+                """)
 
-    total_matches = len(match_list)
-    print(f"\nTotal matches to process: {total_matches}\n")
+        progress["done"] += 1
+        if progress_due(progress["done"], progress["total"]):
+            logger.info(f"✅ {progress['done']}/{progress['total']} matches inserted")
+    except Exception as e:
+        print(f"⚠️ Failed to load events for match {match_id}: {e}")
+
+async def load_events_async(match_ids=None):
+    """Events loader on asyncio: asyncpg binary COPY on a small pool, with up to
+    S3_MAX_WORKERS event files downloading at once."""
+    print("Loading events (asyncio mode)...")
+    rebuild_index = match_ids is None
+    if match_ids is None:
+        match_files = get_match_files(get_json(f"{S3_PREFIX}competitions.json"))
+        match_ids = [m["match_id"] for _, _, matches in match_files for m in matches]
+    progress = {"done": 0, "total": len(match_ids)}
+    print(f"\nTotal matches to process: {len(match_ids)}\n")
+
+    async with asyncpg.create_pool(DATABASE_URL, min_size=2, max_size=8) as pool:
+        async with pool.acquire() as conn:
+            await conn.execute(TABLES["events"])
+            for stmt in EVENTS_SETUP:
+                await conn.execute(stmt)
+            if rebuild_index:
+                await conn.execute(EVENTS_DROP_INDEX)
+
+        semaphore = asyncio.Semaphore(S3_MAX_WORKERS)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=S3_MAX_WORKERS) as executor:
+            await asyncio.gather(*(
+                _load_match_events_async(pool, executor, semaphore, match_id, progress)
+                for match_id in match_ids
+            ))
+
+        if rebuild_index:
+            print("Building idx_match_index...")
+            async with pool.acquire() as conn:
+                await conn.execute(EVENTS_BUILD_INDEX)
+                print("Clustering events...")
+                for stmt in EVENTS_CLUSTER:
+                    try:
+                        await conn.execute(stmt)
+                    except asyncpg.PostgresError as e:
+                        print(f"⚠️ {stmt} failed: {e}")
+
+    print("\n🎉 Done: all events loaded (asyncio).")
 
-    # Run concurrently
-    max_workers = 8  # You can tune this based on EC2 and RDS limits
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        executor.map(lambda m: load_single_match(m, total_matches), match_list)
 
-    print("\n🎉 Done: all events loaded (concurrently).")
+def load_competitions():
+    load_all(["competitions"])
 
+def load_matches():
+    load_all(["matches"])
 
+def load_lineups():
+    load_all(["lineups"])
 
-    print("Loading events...")
-    with psycopg2.connect(DATABASE_URL) as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id SERIAL PRIMARY KEY,
-                    match_id BIGINT,
-                    index INT,
-                    timestamp TEXT,
-                    type TEXT
-                )
-            """)
+def load_events():
+    load_all(["events"])
 
-            competitions = json.load(s3.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_PREFIX}competitions.json")["Body"])
-            total_comps = len(competitions)
+# === CLI loader selector ===
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def main(argv=None):
+    """Run the selected loaders in one process, reusing its connections and caches."""
+    global COPY_PAGE_SIZE
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--type",
+        nargs="+",
+        choices=LOADERS + ["all"],
+        default=["competitions"],
+        help="One or more loaders, run together in a single pass over the match lists"
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Load events with the asyncio/asyncpg pipeline instead of worker threads"
+    )
+    parser.add_argument(
+        "--match-id",
+        dest="match_ids",
+        nargs="+",
+        type=int,
+        help="Only load lineups/events for these matches"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=positive_int,
+        default=COPY_PAGE_SIZE,
+        help="Rows per COPY round-trip"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-            for comp_index, comp in enumerate(competitions):
-                comp_id = comp["competition_id"]
-                season_id = comp["season_id"]
-                print(f"Loading competition {comp_id} season {season_id} ({comp_index + 1}/{total_comps})...")
-                match_key = f"{S3_PREFIX}matches/{comp_id}/{season_id}.json"
+    COPY_PAGE_SIZE = args.batch_size
+    match_ids = set(args.match_ids) if args.match_ids else None
+    selected = LOADERS if "all" in args.type else args.type
+    try:
+        if args.use_async and "events" in selected:
+            others = [name for name in selected if name != "events"]
+            if others:
+                load_all(others, match_ids)
+            asyncio.run(load_events_async(match_ids))
+        else:
+            load_all(selected, match_ids)
+    finally:
+        close_connection()
 
-                try:
-                    matches = json.load(s3.get_object(Bucket=S3_BUCKET_NAME, Key=match_key)["Body"])
-                    total_matches = len(matches)
-
-                    for match_index, match in enumerate(matches):
-                        match_id = match["match_id"]
-                        key = f"{S3_PREFIX}events/{match_id}.json"
-                        data = json.load(s3.get_object(Bucket=S3_BUCKET_NAME, Key=key)["Body"])
-
-                        for event in data:
-                            cur.execute("""
-                                INSERT INTO events (match_id, index, timestamp, type)
-                                VALUES (%s, %s, %s, %s)
-                            """, (
-                                match_id,
-                                event.get("index"),
-                                event.get("timestamp"),
-                                event.get("type", {}).get("name")
-                            ))
-
-                        percent = ((match_index + 1) / total_matches) * 100
-                        print(f"Inserted events for match {match_id} ({match_index + 1}/{total_matches}) - {percent:.2f}% complete")
-
-                except Exception as e:
-                    print(f"Failed to load events for match {match_id}: {e}")
-
-    print("Done: events loaded.")
-# === CLI loader selector ===
 if __name__ == "__main__":
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--type", choices=["competitions", "matches", "lineups", "events"], default="competitions")
-    args = parser.parse_args()
-
-    if args.type == "competitions":
-        load_competitions()
-    elif args.type == "matches":
-        load_matches()
-    elif args.type == "lineups":
-        load_lineups()
-    elif args.type == "events":
-        load_events()
\ No newline at end of file
+    main()
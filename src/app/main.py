@@ -1,35 +1,10 @@
 from fastapi import FastAPI
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import boto3
-import os
+from fastapi.responses import ORJSONResponse
+from db import lifespan, router
 
-app = FastAPI()
-
-# Load DATABASE_URL from AWS SSM Parameter Store
-ssm = boto3.client("ssm", region_name=os.environ.get("AWS_REGION", "us-west-1"))
-param = ssm.get_parameter(Name="/football/DATABASE_URL", WithDecryption=True)
-DATABASE_URL = param["Parameter"]["Value"]
-
-@app.get("/api")
-def read_root():
-    return {"message": "Football analytics API is live!"}
-
-@app.get("/api/db-check")
-def db_check():
-    try:
-        conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1;")
-        result = cursor.fetchone()
-        conn.close()
-        return {"db_status": "Connected", "result": result}
-    except Exception as e:
-        return {"db_status": "Error", "detail": str(e)}
-
-@app.get("/api/health")
-def health_check():
-    return {"status": "ok"}
+# Serialize responses with orjson rather than the stdlib json encoder
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.include_router(router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -26,7 +26,8 @@ def get_engine():
 @st.cache_data(ttl=600, show_spinner=False)
 def sql_df(q: str, params: dict | None = None) -> pd.DataFrame:
     eng = get_engine()
-    with eng.connect() as conn:
+    # Server-side cursor: psycopg2 fetches in batches instead of buffering the whole result
+    with eng.connect().execution_options(stream_results=True, max_row_buffer=10000) as conn:
         return pd.read_sql(text(q), conn, params=params)
 
 @st.cache_data(ttl=600)
@@ -44,13 +45,12 @@ def list_columns(table: str) -> set[str]:
 @st.cache_data(ttl=600)
 def load_matches() -> pd.DataFrame:
     q = """
-    SELECT match_id, competition_id, season_id, match_date, home_team, away_team
+    SELECT match_id, competition_id, season_id, match_date, home_team, away_team,
+           match_date::text || ' — ' || home_team || ' vs ' || away_team AS match_label
     FROM public.matches
     ORDER BY match_date, match_id
     """
-    df = sql_df(q)
-    df["match_label"] = df["match_date"].astype(str) + " — " + df["home_team"] + " vs " + df["away_team"]
-    return df
+    return sql_df(q)
 
 @st.cache_data(ttl=600)
 def comp_map() -> pd.DataFrame:
@@ -105,7 +105,7 @@ if team_matches.empty:
     st.sidebar.warning("No matches found for this team in the selected competition/season.")
     st.stop()
 
-label_to_id = {row["match_label"]: int(row["match_id"]) for _, row in team_matches.iterrows()}
+label_to_id = dict(zip(team_matches["match_label"], team_matches["match_id"].astype(int).tolist()))
 match_label = st.sidebar.selectbox("Match", list(label_to_id.keys()))
 match_id = label_to_id[match_label]
 
@@ -113,29 +113,61 @@ match_id = label_to_id[match_label]
 # Events (minimal schema)
 # -----------------------------
 
+# Minute of a StatsBomb "HH:MM:SS.sss" timestamp, NULL when it doesn't parse (the cast
+# would raise on a malformed value and fail the whole query)
+MINUTE_SQL = r"""
+CASE WHEN timestamp ~ '^\d+:[0-5]\d:[0-5]\d(\.\d+)?$'
+     THEN FLOOR(EXTRACT(EPOCH FROM timestamp::interval) / 60)::int
+END
+"""
+
+EVENTS_PAGE_SIZE = 500
+
+@st.cache_data(ttl=600)
+def load_event_stats(match_id: int) -> tuple[int, int | None]:
+    """(event count, last parsed minute or None), so the tabs can aggregate in SQL
+    instead of pulling every raw event."""
+    q = f"""
+    SELECT COUNT(*) AS n, MAX({MINUTE_SQL}) AS max_minute
+    FROM public.events
+    WHERE match_id = :mid
+    """
+    row = sql_df(q, {"mid": match_id}).iloc[0]
+    return int(row["n"]), None if pd.isna(row["max_minute"]) else int(row["max_minute"])
+
 @st.cache_data(ttl=600)
-def load_events(match_id: int) -> pd.DataFrame:
+def load_events(match_id: int, page: int = 1) -> pd.DataFrame:
     q = """
     SELECT match_id, index, timestamp, type
     FROM public.events
     WHERE match_id = :mid
     ORDER BY index
+    LIMIT :limit OFFSET :offset
     """
-    df = sql_df(q, {"mid": match_id})
-
-    # Parse StatsBomb-like timestamp "HH:MM:SS.sss" -> seconds
-    def to_sec(ts: str) -> float:
-        try:
-            hh, mm, ss = ts.split(":")
-            return int(hh) * 3600 + int(mm) * 60 + float(ss)
-        except Exception:
-            return np.nan
+    df = sql_df(q, {"mid": match_id, "limit": EVENTS_PAGE_SIZE, "offset": (page - 1) * EVENTS_PAGE_SIZE})
 
-    df["sec"] = df["timestamp"].apply(lambda x: to_sec(x) if isinstance(x, str) else np.nan)
+    # Parse StatsBomb-like timestamp "HH:MM:SS.sss" -> seconds (vectorized; bad values -> NaN)
+    df["sec"] = pd.to_timedelta(df["timestamp"], errors="coerce").dt.total_seconds()
     df["minute"] = np.floor(df["sec"] / 60.0).astype("Int64")
     return df
 
-events = load_events(match_id)
+@st.cache_data(ttl=600)
+def load_event_buckets(match_id: int, by_minute: bool) -> pd.DataFrame:
+    # Aggregate in Postgres so only (bucket, type) counts cross the wire
+    bucket = f"COALESCE({MINUTE_SQL}, 0)" if by_minute else "index / 10"
+    q = f"""
+    SELECT {bucket} AS bucket, type, COUNT(*) AS count
+    FROM public.events
+    WHERE match_id = :mid
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    """
+    return sql_df(q, {"mid": match_id})
+
+n_events, max_minute = load_event_stats(match_id)
+# Minute buckets; fallback to index buckets if no timestamp parses
+by_minute = max_minute is not None
+gp = load_event_buckets(match_id, by_minute) if n_events else pd.DataFrame(columns=["bucket", "type", "count"])
 
 st.title("📊 StatsBomb RDS Explorer")
 st.caption(f"{comp} · {season} · {match_label}")
@@ -147,18 +179,10 @@ T1, T2, T3, T4 = st.tabs(["Event timeline", "Type distribution", "Lineups", "Raw
 # Tab 1: Event timeline (stacked by type)
 # -----------------------------
 with T1:
-    if events.empty:
+    if not n_events:
         st.info("No events found for this match.")
     else:
-        # Minute buckets; fallback to index buckets if timestamp missing
-        if events["minute"].isna().all():
-            events["bucket"] = (events["index"] // 10).astype(int)  # crude progression
-            xlab = "Index buckets (×10)"
-        else:
-            events["bucket"] = events["minute"].fillna(0).astype(int)
-            xlab = "Minute"
-
-        gp = events.groupby(["bucket", "type"]).size().reset_index(name="count")
+        xlab = "Minute" if by_minute else "Index buckets (×10)"  # crude progression
         fig = px.area(gp, x="bucket", y="count", color="type", groupnorm=None, title="Events over time (stacked)")
         fig.update_layout(xaxis_title=xlab, yaxis_title="Events")
         st.plotly_chart(fig, use_container_width=True)
@@ -167,23 +191,20 @@ with T1:
 # Tab 2: Type distribution & per-90 rates
 # -----------------------------
 with T2:
-    if events.empty:
+    if not n_events:
         st.info("No events found for this match.")
     else:
         c1, c2 = st.columns(2)
         with c1:
-            ct = events["type"].value_counts().reset_index()
-            ct.columns = ["type", "count"]
+            # Totals per type straight from the bucket counts
+            ct = gp.groupby("type", as_index=False)["count"].sum().sort_values("count", ascending=False)
             fig = px.bar(ct, x="type", y="count", title="Event counts by type")
             fig.update_layout(xaxis_title="Type", yaxis_title="Count")
             st.plotly_chart(fig, use_container_width=True)
 
         with c2:
             # crude minutes estimate = last minute bucket if parsed; else 90
-            if events["minute"].isna().all():
-                minutes = 90
-            else:
-                minutes = max(1, int(events["minute"].dropna().max()) + 1)
+            minutes = 90 if max_minute is None else max(1, max_minute + 1)
             per90 = ct.copy()
             per90["per90"] = per90["count"] * 90.0 / minutes
             fig2 = px.bar(per90, x="type", y="per90", title=f"Per-90 rates (assumed {minutes} minutes)")
@@ -222,7 +243,13 @@ with T3:
 # Tab 4: Raw events table
 # -----------------------------
 with T4:
+    # Paginate in SQL so only one page of rows is fetched and sent to the browser
+    pages = max(1, -(-n_events // EVENTS_PAGE_SIZE))
+    page = int(st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)) if pages > 1 else 1
+    events = load_events(match_id, page)
+    start = (page - 1) * EVENTS_PAGE_SIZE
     st.dataframe(events, use_container_width=True, hide_index=True)
+    st.caption(f"Rows {start + 1 if n_events else 0}–{start + len(events)} of {n_events}")
 
 # -----------------------------
 # Optional: Auto-detect enriched events view
@@ -234,15 +261,20 @@ if {"match_id", "type_name", "team_name", "player_name", "x", "y"}.issubset(cols
     st.caption("Detected a view named `events_enriched` with locations/xG. Rendering shot map…")
 
     @st.cache_data(ttl=600)
-    def load_enriched(mid: int) -> pd.DataFrame:
-        q = """
-        SELECT * FROM public.events_enriched WHERE match_id = :mid
+    def load_enriched(mid: int, columns: tuple[str, ...]) -> pd.DataFrame:
+        # Project only the columns the shot map reads; the view can be very wide
+        q = f"""
+        SELECT {", ".join(columns)} FROM public.events_enriched
+        WHERE match_id = :mid AND type_name = 'Shot'
         """
         return sql_df(q, {"mid": mid})
 
-    E = load_enriched(match_id)
-    shots = E[E["type_name"] == "Shot"].copy()
+    shot_cols = ("x", "y") + (("shot_xg",) if "shot_xg" in cols else ())
+    shots = load_enriched(match_id, shot_cols)
     if not shots.empty:
+        # Vectorized hover labels instead of a per-shot Python f-string loop
+        xg = shots["shot_xg"].to_numpy(dtype=float) if "shot_xg" in shots else np.full(len(shots), np.nan)
+        xg_text = np.where(np.isnan(xg), "xG n/a", np.char.mod("xG %.2f", xg))
         fig = go.Figure()
         fig.add_shape(type="rect", x0=0, y0=0, x1=120, y1=80)
         fig.add_trace(
@@ -250,7 +282,7 @@ if {"match_id", "type_name", "team_name", "player_name", "x", "y"}.issubset(cols
                 x=shots["x"],
                 y=shots["y"],
                 mode="markers",
-                text=[f"xG {x:.2f}" if not pd.isna(x) else "xG n/a" for x in shots.get("shot_xg", 0)],
+                text=xg_text,
                 hovertemplate="x=%{x:.1f}, y=%{y:.1f}<br>%{text}<extra></extra>",
             )
         )